@@ -3,7 +3,6 @@
 # https://creativecommons.org/publicdomain/zero/1.0/
 import time
 import logging
-from time import strftime
 from arduino_iot_cloud import ArduinoCloudClient
 from arduino_iot_cloud import Location
 from arduino_iot_cloud import Schedule
@@ -88,8 +87,12 @@ if __name__ == "__main__":
 
     # This is a periodic cloud object that gets updated at fixed intervals (in this case 1 seconed) with the
     # value returned from its on_read function (a formatted string of the current time). Note this object's
-    # initial value is None, it will be initialized by calling the on_read function.
-    client.register("clk", value=None, on_read=lambda x: strftime("%H:%M:%S", time.localtime()), interval=1.0)
+    # initial value is None, it will be initialized by calling the on_read function. This object is pushed
+    # with qos=0, so the client doesn't wait for the cloud to acknowledge every update, since a lost update
+    # gets replaced by the next one anyway.
+    client.register(
+        "clk", value=None, on_read=lambda x: "%02d:%02d:%02d" % time.localtime()[3:6], interval=1.0, qos=0
+    )
 
     # This is an example of a composite cloud object (a cloud object with multiple variables). In this case
     # a colored light with switch, hue, saturation and brightness attributes. Once initialized, the object's
@@ -4,7 +4,6 @@
 
 import time
 import logging
-from time import strftime
 from machine import Pin
 
 from secrets import DEVICE_ID
@@ -23,14 +22,29 @@ def read_humidity(client):
     return 100.0
 
 
+# The LED pin is configured once, instead of on every switch change.
+led = Pin("LED_BLUE", Pin.OUT)
+
+
 def on_switch_changed(client, value):
-    led = Pin("LED_BLUE", Pin.OUT)
     # Note the LED is usually inverted
     led.value(not value)
     # Update the value of the led cloud variable.
     client["led"] = value
 
 
+def wifi_connection(client, args):
+    # Check the WiFi connection every minute while it's up, and every 5 seconds while it's
+    # down, so it's restored quickly after a drop. Note a task's interval can be changed at
+    # any time, including from its own callback.
+    connected = async_wifi_connection(client, args)
+    wifi_task.interval = 60.0 if connected else 5.0
+
+
+# This task reconnects to WiFi if it ever gets disconnected, see wifi_connection above.
+wifi_task = Task("wifi_connection", on_run=wifi_connection, interval=60.0)
+
+
 if __name__ == "__main__":
     # Configure the logger.
     # All message equal or higher to the logger level are printed.
@@ -64,21 +78,20 @@ if __name__ == "__main__":
     client.register(
         "clk",
         value=None,
-        on_read=lambda x: strftime("%H:%M:%S", time.localtime()),
+        on_read=lambda x: "%02d:%02d:%02d" % time.localtime()[3:6],
         interval=1.0,
     )
 
-    # Register some sensor readings.
-    client.register("humidity", value=None, on_read=read_humidity, interval=1.0)
-    client.register("temperature", value=None, on_read=read_temperature, interval=1.0)
+    # Register some sensor readings. These readings change slowly, so they're only pushed to the
+    # cloud when they change instead of on every read.
+    client.register("humidity", value=None, on_read=read_humidity, interval=1.0, push_changes_only=True)
+    client.register("temperature", value=None, on_read=read_temperature, interval=1.0, push_changes_only=True)
 
     # This function is registered as a background task to reconnect to WiFi if it ever gets
     # disconnected. Note, it can also be used for the initial WiFi connection, in synchronous
     # mode, if it's called without any args (i.e, async_wifi_connection()) at the beginning of
     # this script.
-    client.register(
-        Task("wifi_connection", on_run=async_wifi_connection, interval=60.0)
-    )
+    client.register(wifi_task)
 
     # Start the Arduino IoT cloud client.
     client.start()
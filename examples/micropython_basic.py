@@ -5,7 +5,6 @@ import time
 import ssl # noqa
 import network
 import logging
-from time import strftime
 from arduino_iot_cloud import ArduinoCloudClient
 from arduino_iot_cloud import Location
 from arduino_iot_cloud import Schedule
@@ -52,9 +51,11 @@ def wifi_connect():
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
     wlan.connect(WIFI_SSID, WIFI_PASS)
+    logging.info("Trying to connect. Note this may take a while...")
+    delay = 50
     while not wlan.isconnected():
-        logging.info("Trying to connect. Note this may take a while...")
-        time.sleep_ms(500)
+        time.sleep_ms(delay)
+        delay = min(delay * 2, 2000)
     logging.info(f"WiFi Connected {wlan.ifconfig()}")
 
 
@@ -102,7 +103,7 @@ if __name__ == "__main__":
     # This is a periodic cloud object that gets updated at fixed intervals (in this case 1 seconed) with the
     # value returned from its on_read function (a formatted string of the current time). Note this object's
     # initial value is None, it will be initialized by calling the on_read function.
-    client.register("clk", value=None, on_read=lambda x: strftime("%H:%M:%S", time.localtime()), interval=1.0)
+    client.register("clk", value=None, on_read=lambda x: "%02d:%02d:%02d" % time.localtime()[3:6], interval=1.0)
 
     # This is an example of a composite cloud object (a cloud object with multiple variables). In this case
     # a colored light with switch, hue, saturation and brightness attributes. Once initialized, the object's
@@ -4,51 +4,69 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
-import binascii
 from .ucloud import ArduinoCloudClient  # noqa
 from .ucloud import ArduinoCloudObject
 from .ucloud import ArduinoCloudObject as Task  # noqa
 from .ucloud import timestamp
 
 
-CADATA = binascii.unhexlify(
-    b"308201cf30820174a00302010202141f101deba7e125e727c1a391e3ec0d"
-    b"174ded4a59300a06082a8648ce3d0403023045310b300906035504061302"
-    b"555331173015060355040a130e41726475696e6f204c4c43205553310b30"
-    b"09060355040b130249543110300e0603550403130741726475696e6f301e"
-    b"170d3138303732343039343730305a170d3438303731363039343730305a"
-    b"3045310b300906035504061302555331173015060355040a130e41726475"
-    b"696e6f204c4c43205553310b3009060355040b130249543110300e060355"
-    b"0403130741726475696e6f3059301306072a8648ce3d020106082a8648ce"
-    b"3d030107034200046d776c5acf611c7d449851f25ee1024077b79cbd49a2"
-    b"a38c4eab5e98ac82fc695b442277b44d2e8edf2a71c1396cd63914bdd96b"
-    b"184b4becb3d5ee4289895522a3423040300e0603551d0f0101ff04040302"
-    b"0106300f0603551d130101ff040530030101ff301d0603551d0e04160414"
-    b"5b3e2a6b8ec9b01aa854e6369b8c09f9fce1b980300a06082a8648ce3d04"
-    b"03020349003046022100bfd3dc236668b50adc3f0d0ec373e20ac7f760aa"
-    b"100dd320bfe102969b6b05d8022100ead9d9da5acd12529709a8ed660fe1"
-    b"8d6444ffe82217304ff2b89aafca8ecf6c"
+# Arduino IoT Cloud's root CA certificate (DER), stored as a bytes literal so it doesn't
+# need to be decoded on import.
+CADATA = (
+    b"\x30\x82\x01\xcf\x30\x82\x01\x74\xa0\x03\x02\x01\x02\x02\x14\x1f\x10\x1d\xeb\xa7"
+    b"\xe1\x25\xe7\x27\xc1\xa3\x91\xe3\xec\x0d\x17\x4d\xed\x4a\x59\x30\x0a\x06\x08\x2a"
+    b"\x86\x48\xce\x3d\x04\x03\x02\x30\x45\x31\x0b\x30\x09\x06\x03\x55\x04\x06\x13\x02"
+    b"\x55\x53\x31\x17\x30\x15\x06\x03\x55\x04\x0a\x13\x0e\x41\x72\x64\x75\x69\x6e\x6f"
+    b"\x20\x4c\x4c\x43\x20\x55\x53\x31\x0b\x30\x09\x06\x03\x55\x04\x0b\x13\x02\x49\x54"
+    b"\x31\x10\x30\x0e\x06\x03\x55\x04\x03\x13\x07\x41\x72\x64\x75\x69\x6e\x6f\x30\x1e"
+    b"\x17\x0d\x31\x38\x30\x37\x32\x34\x30\x39\x34\x37\x30\x30\x5a\x17\x0d\x34\x38\x30"
+    b"\x37\x31\x36\x30\x39\x34\x37\x30\x30\x5a\x30\x45\x31\x0b\x30\x09\x06\x03\x55\x04"
+    b"\x06\x13\x02\x55\x53\x31\x17\x30\x15\x06\x03\x55\x04\x0a\x13\x0e\x41\x72\x64\x75"
+    b"\x69\x6e\x6f\x20\x4c\x4c\x43\x20\x55\x53\x31\x0b\x30\x09\x06\x03\x55\x04\x0b\x13"
+    b"\x02\x49\x54\x31\x10\x30\x0e\x06\x03\x55\x04\x03\x13\x07\x41\x72\x64\x75\x69\x6e"
+    b"\x6f\x30\x59\x30\x13\x06\x07\x2a\x86\x48\xce\x3d\x02\x01\x06\x08\x2a\x86\x48\xce"
+    b"\x3d\x03\x01\x07\x03\x42\x00\x04\x6d\x77\x6c\x5a\xcf\x61\x1c\x7d\x44\x98\x51\xf2"
+    b"\x5e\xe1\x02\x40\x77\xb7\x9c\xbd\x49\xa2\xa3\x8c\x4e\xab\x5e\x98\xac\x82\xfc\x69"
+    b"\x5b\x44\x22\x77\xb4\x4d\x2e\x8e\xdf\x2a\x71\xc1\x39\x6c\xd6\x39\x14\xbd\xd9\x6b"
+    b"\x18\x4b\x4b\xec\xb3\xd5\xee\x42\x89\x89\x55\x22\xa3\x42\x30\x40\x30\x0e\x06\x03"
+    b"\x55\x1d\x0f\x01\x01\xff\x04\x04\x03\x02\x01\x06\x30\x0f\x06\x03\x55\x1d\x13\x01"
+    b"\x01\xff\x04\x05\x30\x03\x01\x01\xff\x30\x1d\x06\x03\x55\x1d\x0e\x04\x16\x04\x14"
+    b"\x5b\x3e\x2a\x6b\x8e\xc9\xb0\x1a\xa8\x54\xe6\x36\x9b\x8c\x09\xf9\xfc\xe1\xb9\x80"
+    b"\x30\x0a\x06\x08\x2a\x86\x48\xce\x3d\x04\x03\x02\x03\x49\x00\x30\x46\x02\x21\x00"
+    b"\xbf\xd3\xdc\x23\x66\x68\xb5\x0a\xdc\x3f\x0d\x0e\xc3\x73\xe2\x0a\xc7\xf7\x60\xaa"
+    b"\x10\x0d\xd3\x20\xbf\xe1\x02\x96\x9b\x6b\x05\xd8\x02\x21\x00\xea\xd9\xd9\xda\x5a"
+    b"\xcd\x12\x52\x97\x09\xa8\xed\x66\x0f\xe1\x8d\x64\x44\xff\xe8\x22\x17\x30\x4f\xf2"
+    b"\xb8\x9a\xaf\xca\x8e\xcf\x6c"
 )
 
 
+# Sub-records names of the complex objects.
+_LOCATION_KEYS = ("lat", "lon")
+_COLOR_KEYS = ("hue", "sat", "bri")
+_COLORED_LIGHT_KEYS = ("swi", "hue", "sat", "bri")
+_DIMMED_LIGHT_KEYS = ("swi", "bri")
+_SCHEDULE_KEYS = ("frm", "to", "len", "msk")
+_TELEVISION_KEYS = ("swi", "vol", "mut", "pbc", "inp", "cha")
+
+
 class Location(ArduinoCloudObject):
     def __init__(self, name, **kwargs):
-        super().__init__(name, keys={"lat", "lon"}, **kwargs)
+        super().__init__(name, keys=_LOCATION_KEYS, **kwargs)
 
 
 class Color(ArduinoCloudObject):
     def __init__(self, name, **kwargs):
-        super().__init__(name, keys={"hue", "sat", "bri"}, **kwargs)
+        super().__init__(name, keys=_COLOR_KEYS, **kwargs)
 
 
 class ColoredLight(ArduinoCloudObject):
     def __init__(self, name, **kwargs):
-        super().__init__(name, keys={"swi", "hue", "sat", "bri"}, **kwargs)
+        super().__init__(name, keys=_COLORED_LIGHT_KEYS, **kwargs)
 
 
 class DimmedLight(ArduinoCloudObject):
     def __init__(self, name, **kwargs):
-        super().__init__(name, keys={"swi", "bri"}, **kwargs)
+        super().__init__(name, keys=_DIMMED_LIGHT_KEYS, **kwargs)
 
 
 class Schedule(ArduinoCloudObject):
@@ -58,17 +76,24 @@ class Schedule(ArduinoCloudObject):
         # Uncomment to allow the schedule to change in runtime.
         # kwargs["on_write"] = kwargs.get("on_write", lambda aiot, value: None)
         self.active = False
-        super().__init__(name, keys={"frm", "to", "len", "msk"}, **kwargs)
+        super().__init__(name, keys=_SCHEDULE_KEYS, **kwargs)
 
     def on_run(self, aiot, args=None):
         if self.initialized:
             ts = timestamp() + aiot.get("tz_offset", 0)
-            if ts > self.frm and ts < (self.frm + self.len):
+            frm = self.frm  # Sub-records are read through __getattr__, so read each one once.
+            end = frm + self.len
+            if frm < ts < end:
                 if not self.active and self.on_active is not None:
                     self.on_active(aiot, self.value)
                 self.active = True
+                wait = end - ts
             else:
                 self.active = False
+                wait = frm + 1 - ts if ts <= frm else 60
+            # Instead of polling at a fixed interval, the next run is scheduled when the schedule
+            # starts or ends, or in a minute at most, so time zone changes are picked up.
+            self.interval = min(wait, 60)
 
 
 class Television(ArduinoCloudObject):
@@ -144,9 +169,7 @@ class Television(ArduinoCloudObject):
     INPUT_XBOX = 60
 
     def __init__(self, name, **kwargs):
-        super().__init__(
-            name, keys={"swi", "vol", "mut", "pbc", "inp", "cha"}, **kwargs
-        )
+        super().__init__(name, keys=_TELEVISION_KEYS, **kwargs)
 
 
 def async_wifi_connection(client=None, args=None, connecting=[False]):
@@ -178,10 +201,15 @@ def async_wifi_connection(client=None, args=None, connecting=[False]):
         connecting[0] = True
         logging.info("WiFi is down. Trying to reconnect.")
 
-    # Running in sync mode, block until WiFi is connected.
+    # Running in sync mode, block until WiFi is connected. The connection is checked often at
+    # first, so it's detected quickly when the AP is ready, and then less often.
     if client is None:
+        logging.info("Trying to connect to WiFi.")
+        delay = 50
         while not wlan.isconnected():
-            logging.info("Trying to connect to WiFi.")
-            time.sleep(1.0)
+            time.sleep_ms(delay)
+            delay = min(delay * 2, 2000)
         connecting[0] = False
         logging.info(f"WiFi Connected {wlan.ifconfig()}")
+
+    return wlan.isconnected()
@@ -7,17 +7,31 @@
 import time
 import logging
 import cbor2
-from senml import SenmlPack
 from senml import SenmlRecord
 from arduino_iot_cloud.umqtt import MQTTClient
+from arduino_iot_cloud.usenml import encode_pack
+from arduino_iot_cloud.usenml import NAMING_MAP
+from arduino_iot_cloud.usenml import SENML_N
+from arduino_iot_cloud.usenml import SENML_BN
 import asyncio
 from asyncio import CancelledError
-try:
+if hasattr(asyncio, "InvalidStateError"):
     from asyncio import InvalidStateError
-except (ImportError, AttributeError):
+else:
     # MicroPython doesn't have this exception
     class InvalidStateError(Exception):
         pass
+# MicroPython's asyncio has millisecond variants of sleep() and wait_for(), which
+# avoid converting float timeouts to milliseconds on every call.
+if hasattr(asyncio, "sleep_ms"):
+    _sleep_ms = asyncio.sleep_ms
+    _wait_for_ms = asyncio.wait_for_ms
+else:
+    def _sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+    def _wait_for_ms(aw, ms):
+        return asyncio.wait_for(aw, ms / 1000)
 try:
     from arduino_iot_cloud._version import __version__
 except (ImportError, AttributeError):
@@ -29,6 +43,9 @@ _DEFAULT_SERVER = "iot.arduino.cc"
 # Default port for cert based auth and basic auth.
 _DEFAULT_PORT = (8883, 8884)
 
+# Min interval between NTP attempts before connecting, if the RTC couldn't be set from NTP.
+_NTP_RETRY_INTERVAL = 60
+
 
 class DoneException(Exception):
     pass
@@ -46,132 +63,214 @@ def log_level_enabled(level):
     return logging.getLogger().isEnabledFor(level)
 
 
+def _can_wait_readable():
+    # _wait_readable() relies on MicroPython's private IO queue, so check it's there
+    # before using it. Note the IO queue is looked up on every call, since it's
+    # replaced when a new event loop is created.
+    return hasattr(getattr(asyncio.core, "_io_queue", None), "queue_read")
+
+
+def _wait_readable(sock):
+    # Suspends the calling task until the socket becomes readable, the same way
+    # MicroPython's asyncio streams wait for data, but without reading from it.
+    yield asyncio.core._io_queue.queue_read(sock)
+
+
 class ArduinoCloudObject(SenmlRecord):
+    # Defaults for the attributes that most objects don't change, for example the sub-records
+    # of complex objects, which have no callbacks. These are class attributes so they don't
+    # take any space in objects that don't set them.
+    on_read = None
+    on_write = None
+    on_run = None
+    interval = 1.0
+    backoff = None
+    args = None
+    qos = 1         # QoS level used to push the object, objects pushed with qos=0 aren't acknowledged.
+    push_changes_only = False   # If set, values read with on_read are only pushed if they changed.
+    client = None   # Set when the object is registered with a client.
+    parent = None   # Set for the sub-records of complex objects.
+    dtype = None    # Type of the current value, or None if it's not set.
+    composite = False
+    runnable = False
+    last_poll = 0
+    on_write_scheduled = False
+    write_event = None  # Created in run(), set when the object is written by the cloud.
+
     def __init__(self, name, **kwargs):
-        self.on_read = kwargs.pop("on_read", None)
-        self.on_write = kwargs.pop("on_write", None)
-        self.on_run = kwargs.pop("on_run", None)
-        self.interval = kwargs.pop("interval", 1.0)
-        self.backoff = kwargs.pop("backoff", None)
-        self.args = kwargs.pop("args", None)
+        for attr in ("on_read", "on_write", "on_run", "interval", "backoff", "args", "qos", "push_changes_only"):
+            if attr in kwargs:
+                setattr(self, attr, kwargs.pop(attr))
         value = kwargs.pop("value", None)
-        if keys := kwargs.pop("keys", {}):
+        if keys := kwargs.pop("keys", ()):
             value = {   # Create a complex object (with sub-records).
-                k: ArduinoCloudObject(f"{name}:{k}", value=v, callback=self.senml_callback)
-                for (k, v) in {k: kwargs.pop(k, None) for k in keys}.items()
+                k: ArduinoCloudObject(f"{name}:{k}", value=kwargs.pop(k, None), callback=self.senml_callback)
+                for k in keys
             }
+            for r in value.values():
+                r.parent = self
+        # Flat list of the records that get added to a SenML pack for this object.
+        self.leaves = list(value.values()) if keys else [self]
         self._updated = False
-        self.on_write_scheduled = False
         self.timestamp = timestamp()
-        self.last_poll = timestamp_ms()
-        self.runnable = any((self.on_run, self.on_read, self.on_write))
+        if any((self.on_run, self.on_read, self.on_write)):
+            self.runnable = True
+            self.last_poll = timestamp_ms()
         callback = kwargs.pop("callback", self.senml_callback)
         for key in kwargs:  # kwargs should be empty by now, unless a wrong attr was used.
             raise TypeError(f"'{self.__class__.__name__}' got an unexpected keyword argument '{key}'")
         super().__init__(name, value=value, callback=callback)
+        if keys:
+            # Set last, since once it's set, attributes are checked against the sub-records.
+            self.composite = True
 
     def __repr__(self):
         return f"{self.value}"
 
     def __contains__(self, key):
-        return isinstance(self.value, dict) and key in self._value
+        return self.composite and key in self._value
 
     @property
     def updated(self):
-        if isinstance(self.value, dict):
-            return any(r._updated for r in self.value.values())
+        if self.composite:
+            return any(r._updated for r in self.leaves)
         return self._updated
 
     @updated.setter
     def updated(self, value):
-        if isinstance(self.value, dict):
-            for r in self.value.values():
+        if self.composite:
+            for r in self.leaves:
                 r._updated = value
         self._updated = value
 
     @property
     def initialized(self):
-        if isinstance(self.value, dict):
-            return all(r.initialized for r in self.value.values())
+        if self.composite:
+            return all(r._value is not None for r in self.leaves)
         return self.value is not None
 
     @SenmlRecord.value.setter
     def value(self, value):
         if value is not None:
-            if self.value is not None:
-                # This is a workaround for the cloud float/int conversion bug.
-                if isinstance(self.value, float) and isinstance(value, int):
-                    value = float(value)
-                if not isinstance(self.value, type(value)):
-                    raise TypeError(
-                        f"{self.name} set to invalid data type, expected: {type(self.value)} got: {type(value)}"
-                    )
+            dtype = self.dtype
+            if type(value) is not dtype:
+                # The type is only checked when it differs from the current value's type. The
+                # current value must be an instance of the new value's type.
+                if dtype is not None:
+                    # This is a workaround for the cloud float/int conversion bug.
+                    if dtype is float and isinstance(value, int):
+                        value = float(value)
+                    elif not issubclass(dtype, type(value)):
+                        raise TypeError(
+                            f"{self.name} set to invalid data type, expected: {dtype} got: {type(value)}"
+                        )
+                self.dtype = type(value)
             self._updated = True
             self.timestamp = timestamp()
+            if self.client is not None:
+                self.client.record_updated(self if self.parent is None else self.parent)
             if log_level_enabled(logging.DEBUG):
                 logging.debug(
                     f"%s: {self.name} value: {value} ts: {self.timestamp}"
-                    % ("Init" if self.value is None else "Update")
+                    % ("Init" if self._value is None else "Update")
                 )
+        else:
+            self.dtype = None
         self._value = value
 
     def __getattr__(self, attr):
-        if isinstance(self.__dict__.get("_value", None), dict) and attr in self._value:
-            return self._value[attr].value
+        # Note composite is a class attribute, so it can be read here before __init__ sets
+        # it without recursing, and sub-records values are read directly.
+        if self.composite and attr in self._value:
+            return self._value[attr]._value
         raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{attr}'")
 
     def __setattr__(self, attr, value):
-        if isinstance(self.__dict__.get("_value", None), dict) and attr in self._value:
+        # Sub-records are checked first, so a sub-record named like one of the object's own
+        # attributes is still set. Note other objects only pay for reading the composite flag.
+        if self.composite and attr in self._value:
             self._value[attr].value = value
         else:
             super().__setattr__(attr, value)
 
-    def _build_rec_dict(self, naming_map, appendTo):
-        # This function builds a dict of records from a pack, which gets converted to CBOR and
-        # pushed to the cloud on the next update.
-        if isinstance(self.value, dict):
-            for r in self.value.values():
-                r._build_rec_dict(naming_map, appendTo)
-        else:
-            super()._build_rec_dict(naming_map, appendTo)
-
     def add_to_pack(self, pack, push=False):
-        # This function adds records that will be pushed to (or updated from) the cloud, to the SenML pack.
+        # This function adds records that will be pushed to (or updated from) the cloud, to the pack.
         # NOTE: When pushing records to the cloud (push==True) only fully initialized records are added to
         # the pack. And when updating records from the cloud (push==False), partially initialized records
         # are allowed in the pack, so they can be initialized from the cloud.
         # NOTE: all initialized sub-records are added to the pack whether they changed their state since the
         # last update or not, because the cloud currently does not support partial objects updates.
-        if isinstance(self._value, dict):
-            if not push or self.initialized:
-                for r in self._value.values():
-                    pack.add(r)
-        elif not push or self._value is not None:
-            pack.add(self)
+        if not push or self.initialized:
+            pack.extend(self.leaves)
         self.updated = False
 
     def senml_callback(self, record, **kwargs):
         # This function gets called after a record is updated from the cloud (from_cbor).
         # The updated flag is cleared to avoid sending the same value again to the cloud,
         # and the on_write function flag is set to so it gets called on the next run.
+        # The object was queued by the value setter, and is dropped from the queue so it
+        # doesn't start a batch wait in the MQTT task.
         self.updated = False
+        if self.client is not None:
+            self.client.dirty_records.discard(self)
         self.on_write_scheduled = True
+        if self.write_event is not None:
+            self.write_event.set()
 
     async def run(self, client):
+        if self.on_write is not None:
+            self.write_event = asyncio.Event()
+        # Intervals are counted from when the previous run was due, rather than from when it
+        # ended, so the time spent in callbacks doesn't make the runs drift. If a run is late,
+        # the next one is scheduled a full interval from now instead of trying to catch up,
+        # so a slow run (e.g. a blocking connection attempt) still sleeps before the next one.
+        deadline = timestamp_ms()
         while True:
             self.run_sync(client)
-            await asyncio.sleep(self.interval)
+            now = timestamp_ms()
+            iv = int(self.interval * 1000)
+            deadline = deadline + iv if deadline + iv > now else now + iv
+            if self.write_event is None:
+                await _sleep_ms(deadline - timestamp_ms())
+            else:
+                await self.wait_writes(client, deadline)
             if self.backoff is not None:
                 self.interval = min(self.interval * self.backoff, 5.0)
 
+    async def wait_writes(self, client, deadline):
+        # Waits until the next run is due, and calls on_write as soon as the object is written
+        # by the cloud in the meantime. Objects with only an on_write callback have nothing
+        # to do on intervals, so they just wait for the next write.
+        periodic = self.on_run is not None or self.on_read is not None
+        while True:
+            if periodic:
+                timeout = deadline - timestamp_ms()
+                if timeout <= 0:
+                    break
+                try:
+                    await _wait_for_ms(self.write_event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                await self.write_event.wait()
+            self.write_event.clear()
+            self.run_write(client)
+            if not periodic:
+                break
+
     def run_sync(self, client):
         if self.on_run is not None:
             self.on_run(client, self.args)
         if self.on_read is not None:
-            self.value = self.on_read(client)
+            value = self.on_read(client)
+            if not self.push_changes_only or value != self._value:
+                self.value = value
+        self.run_write(client)
+
+    def run_write(self, client):
         if self.on_write is not None and self.on_write_scheduled:
             self.on_write_scheduled = False
-            self.on_write(client, self if isinstance(self.value, dict) else self.value)
+            self.on_write(client, self if self.composite else self.value)
 
 
 class ArduinoCloudClient:
@@ -186,18 +285,32 @@ class ArduinoCloudClient:
             keepalive=10,
             ntp_server="pool.ntp.org",
             ntp_timeout=3,
-            sync_mode=False
+            sync_mode=False,
+            max_batch=10,
+            max_batch_age=0.1
     ):
         self.tasks = {}
         self.records = {}
+        self.record_leaves = {}  # Maps records and sub-records names to the records.
+        self.runnable_records = []  # Records polled by the scheduler in sync mode.
         self.thing_id = None
         self.keepalive = keepalive
         self.last_ping = timestamp()
-        self.senmlpack = SenmlPack("", self.senml_generic_callback)
+        self.senmlpack = []     # Records to push, encoded as a SenML pack by encode_pack().
         self.ntp_server = ntp_server
         self.ntp_timeout = ntp_timeout
+        self.systime_updated = False    # Set once the RTC is updated from NTP, see poll_connect.
+        self.last_ntp_ms = 0    # Time of the last NTP attempt.
+        self.lastvalues_requested = False   # Set once r:m is registered, see register.
         self.async_mode = not sync_mode
         self.connected = False
+        self.dirty = None   # Created in run(), set when any record is updated.
+        self.batch_full = None  # Created in run(), set when max_batch records are queued.
+        self.done_tasks = None  # Created in run(), if the event loop supports done callbacks.
+        self.dirty_records = set()
+        self.cborbuf = bytearray()  # Used to encode every SenML pack that gets pushed.
+        self.max_batch = max_batch  # Max number of updated records to wait for before pushing.
+        self.max_batch_age = max_batch_age  # Max time to wait for more updated records.
 
         # Convert args to bytes if they are passed as strings.
         if isinstance(device_id, str):
@@ -209,9 +322,8 @@ class ArduinoCloudClient:
 
         self.device_topic = b"/a/d/" + device_id + b"/e/i"
         self.command_topic = b"/a/d/" + device_id + b"/c/up"
-
-        # Update RTC from NTP server on MicroPython.
-        self.update_systime()
+        # The thing's topics are built once the thing ID is known.
+        self.topic_in = self.topic_out = self.shadow_in = self.shadow_out = None
 
         # If no server/port were passed in args, set the default server/port
         # based on authentication type.
@@ -230,7 +342,7 @@ class ArduinoCloudClient:
             self.register(name, value=None)
 
     def __getitem__(self, key):
-        if isinstance(self.records[key].value, dict):
+        if self.records[key].composite:
             return self.records[key]
         return self.records[key].value
 
@@ -246,14 +358,16 @@ class ArduinoCloudClient:
         return default
 
     def update_systime(self, server=None, timeout=None):
+        self.last_ntp_ms = timestamp_ms()
         try:
             import ntptime
             ntptime.host = self.ntp_server if server is None else server
             ntptime.timeout = self.ntp_timeout if timeout is None else timeout
             ntptime.settime()
+            self.systime_updated = True
             logging.info("RTC time set from NTP.")
         except ImportError:
-            pass    # No ntptime module.
+            self.systime_updated = True     # No ntptime module, the system time is used as is.
         except Exception as e:
             if log_level_enabled(logging.ERROR):
                 logging.error(f"Failed to set RTC time from NTP: {e}.")
@@ -263,15 +377,44 @@ class ArduinoCloudClient:
             coro = coro(*args)
         try:
             asyncio.get_event_loop()
-            self.tasks[name] = asyncio.create_task(coro)
-            if log_level_enabled(logging.INFO):
-                logging.info(f"task: {name} created.")
-        except Exception:
+            task = self.tasks[name] = asyncio.create_task(coro)
+        except RuntimeError:
             # Defer task creation until there's a running event loop.
             self.tasks[name] = coro
+            return
+        if self.done_tasks is not None:
+            task.add_done_callback(lambda task: self.done_tasks.put_nowait((name, task)))
+        if log_level_enabled(logging.INFO):
+            logging.info(f"task: {name} created.")
+
+    def record_updated(self, record):
+        # Called when a registered record is updated locally. The record is queued to be
+        # pushed on the next MQTT poll, and in async mode the MQTT task is woken up so the
+        # update gets pushed to the cloud without any delay. Note for complex objects, the
+        # top-level record is queued, since they're always pushed with all their sub-records.
+        self.dirty_records.add(record)
+        if self.dirty is not None:
+            self.dirty.set()
+            if len(self.dirty_records) >= self.max_batch:
+                self.batch_full.set()
+
+    def socket_readable(self):
+        # Called when the MQTT socket becomes readable. This also ends any batch wait, so
+        # incoming messages are processed right away. Note readiness is level-triggered, so
+        # this keeps getting called until the MQTT task reads the socket.
+        self.dirty.set()
+        self.batch_full.set()
+
+    def encode_pack(self):
+        # Encodes the records in the SenML pack. Note the buffer is shared, so the result is
+        # only valid until the next call. MicroPython keeps the buffer's capacity when it's
+        # truncated, but CPython frees it, so encoding still allocates there. In both cases
+        # publish() copies the payload into the MQTT packet.
+        self.cborbuf[:] = b""
+        return encode_pack(self.senmlpack, self.cborbuf)
 
     def create_topic(self, topic, inout):
-        return bytes(f"/a/t/{self.thing_id}/{topic}/{inout}", "utf-8")
+        return self.topic_prefix + topic + b"/" + inout
 
     def register(self, aiotobj, coro=None, **kwargs):
         if isinstance(aiotobj, str):
@@ -280,20 +423,54 @@ class ArduinoCloudClient:
             aiotobj = ArduinoCloudObject(aiotobj, **kwargs)
 
         # Register the ArduinoCloudObject
+        if aiotobj.name in self.records:
+            self.unregister(aiotobj.name)
         self.records[aiotobj.name] = aiotobj
+        if aiotobj.runnable:
+            self.runnable_records.append(aiotobj)
+        for r in aiotobj.leaves:
+            self.record_leaves[r.name] = r
+        aiotobj.client = self
+        if aiotobj.composite:
+            for r in aiotobj.leaves:
+                r.client = self
+
+        # Queue the object to be pushed, if it was registered with an initial value.
+        if aiotobj.updated:
+            self.record_updated(aiotobj)
 
         # Check if object needs to be initialized from the cloud.
-        if not aiotobj.initialized and "r:m" not in self.records:
+        # The last values are only requested once, during discovery. Objects registered after
+        # that, for example the connection task on reconnection, are initialized when
+        # the cloud next sends them.
+        if not self.lastvalues_requested and not aiotobj.initialized:
+            self.lastvalues_requested = True
             self.register("r:m", value="getLastValues")
 
         # Create a task for this object if it has any callbacks.
         if self.async_mode and aiotobj.runnable:
             self.create_task(aiotobj.name, aiotobj.run, self)
 
+    def unregister(self, name):
+        # Removes a registered object, returns the object or None if it's not registered.
+        aiotobj = self.records.pop(name, None)
+        if aiotobj is not None:
+            if aiotobj in self.runnable_records:
+                self.runnable_records.remove(aiotobj)
+            for r in aiotobj.leaves:
+                self.record_leaves.pop(r.name, None)
+            # Drop the object from the push queue, and detach it from the client, so it isn't
+            # pushed or queued again once unregistered.
+            self.dirty_records.discard(aiotobj)
+            aiotobj.client = None
+            if aiotobj.composite:
+                for r in aiotobj.leaves:
+                    r.client = None
+        return aiotobj
+
     def senml_generic_callback(self, record, **kwargs):
         # This callback catches all unknown/umatched sub/records that were not part of the pack.
-        rname, sname = record.name.split(":") if ":" in record.name else [record.name, None]
-        if rname in self.records:
+        if record.name in self.record_leaves:
             if log_level_enabled(logging.INFO):
                 logging.info(f"Ignoring cloud initialization for record: {record.name}")
         else:
@@ -303,15 +480,30 @@ class ArduinoCloudClient:
     def mqtt_callback(self, topic, message):
         if log_level_enabled(logging.DEBUG):
             logging.debug(f"mqtt topic: {topic[-8:]}... message: {message[:8]}...")
-        self.senmlpack.clear()
-        for record in self.records.values():
-            # If the object is uninitialized, updates are always allowed even if it's a read-only
-            # object. Otherwise, for initialized objects, updates are only allowed if the object
-            # is writable (on_write function is set) and the value is received from the out topic.
-            if not record.initialized or (record.on_write is not None and b"shadow" not in topic):
-                record.add_to_pack(self.senmlpack)
-        self.senmlpack.from_cbor(message)
-        self.senmlpack.clear()
+        # If the object is uninitialized, updates are always allowed even if it's a read-only
+        # object. Otherwise, for initialized objects, updates are only allowed if the object
+        # is writable (on_write function is set) and the value is received from the out topic.
+        # Records are dispatched directly to the registered records, by name, instead of going
+        # through a SenML pack. Whether an object accepts updates is decided once per message,
+        # so a complex object initialized by this message still gets all of its sub-records.
+        shadow = topic == self.shadow_in
+        allowed = {}
+        for raw in cbor2.loads(message):
+            record = None
+            name = raw.get(SENML_N)
+            if not raw.get(SENML_BN):
+                record = self.record_leaves.get(name)
+            if record is not None:
+                aiotobj = record.parent or record
+                if (accept := allowed.get(aiotobj.name)) is None:
+                    accept = not aiotobj.initialized or (aiotobj.on_write is not None and not shadow)
+                    allowed[aiotobj.name] = accept
+                if accept:
+                    record.do_actuate(raw, NAMING_MAP)
+                    continue
+            record = SenmlRecord(name)
+            record._from_raw(raw, NAMING_MAP)
+            self.senml_generic_callback(record)
 
     def ts_expired(self, ts, last_ts_ms, interval_s):
         return last_ts_ms == 0 or (ts - last_ts_ms) > int(interval_s * 1000)
@@ -319,16 +511,23 @@ class ArduinoCloudClient:
     def poll_records(self):
         ts = timestamp_ms()
         try:
-            for record in self.records.values():
-                if record.runnable and self.ts_expired(ts, record.last_poll, record.interval):
+            for record in self.runnable_records:
+                if self.ts_expired(ts, record.last_poll, record.interval):
                     record.run_sync(self)
                     record.last_poll = ts
         except Exception as e:
-            self.records.pop(record.name)
+            self.unregister(record.name)
             if log_level_enabled(logging.ERROR):
                 logging.error(f"task: {record.name} raised exception: {str(e)}.")
 
     def poll_connect(self, aiot=None, args=None):
+        # Update the RTC from NTP on MicroPython before connecting, since TLS needs the correct
+        # time to verify certificates. This is done here rather than when the client is created,
+        # so creating the client doesn't block on the network, which might not be up yet. If
+        # NTP fails, it's only retried every _NTP_RETRY_INTERVAL, so connection attempts aren't
+        # delayed by the NTP timeout every time.
+        if not self.systime_updated and self.ts_expired(timestamp_ms(), self.last_ntp_ms, _NTP_RETRY_INTERVAL):
+            self.update_systime()
         logging.info("Connecting to Arduino IoT cloud...")
         try:
             self.mqtt.connect()
@@ -340,29 +539,40 @@ class ArduinoCloudClient:
         if self.thing_id is None:
             self.mqtt.subscribe(self.device_topic, qos=1)
         else:
-            self.mqtt.subscribe(self.create_topic("e", "i"))
+            self.mqtt.subscribe(self.topic_in)
 
         if self.async_mode:
             if self.thing_id is None:
                 self.register("discovery", on_run=self.poll_discovery, interval=0.500)
-            self.register("mqtt_task", on_run=self.poll_mqtt, interval=1.0)
+            self.create_task("mqtt_task", self.mqtt_task)
             raise DoneException()
         self.connected = True
 
     def poll_discovery(self, aiot=None, args=None):
-        self.mqtt.check_msg()
+        # In async mode, incoming messages are processed by the MQTT task.
+        if not self.async_mode:
+            self.mqtt.check_msg()
         if self.records.get("thing_id").value is not None:
-            self.thing_id = self.records.pop("thing_id").value
+            self.thing_id = self.unregister("thing_id").value
             if not self.thing_id:  # Empty thing ID should not happen.
                 raise Exception("Device is not linked to a Thing ID.")
 
-            self.topic_out = self.create_topic("e", "o")
-            self.mqtt.subscribe(self.create_topic("e", "i"))
-
-            if lastval_record := self.records.pop("r:m", None):
+            # Build the thing's topics once, they're reused on every publish and reconnection.
+            self.topic_prefix = b"/a/t/" + bytes(self.thing_id, "utf-8") + b"/"
+            self.topic_in = self.create_topic(b"e", b"i")
+            self.topic_out = self.create_topic(b"e", b"o")
+            self.shadow_in = self.create_topic(b"shadow", b"i")
+            self.shadow_out = self.create_topic(b"shadow", b"o")
+            self.mqtt.subscribe(self.topic_in)
+            # Wake up the MQTT task to push the records queued before discovery.
+            if self.dirty is not None:
+                self.dirty.set()
+
+            if lastval_record := self.unregister("r:m"):
+                self.senmlpack.clear()
                 lastval_record.add_to_pack(self.senmlpack)
-                self.mqtt.subscribe(self.create_topic("shadow", "i"), qos=1)
-                self.mqtt.publish(self.create_topic("shadow", "o"), self.senmlpack.to_cbor(), qos=1)
+                self.mqtt.subscribe(self.shadow_in, qos=1)
+                self.mqtt.publish(self.shadow_out, self.encode_pack(), qos=1)
 
             if hasattr(cbor2, "dumps"):
                 # Push library version and mode.
@@ -374,27 +584,132 @@ class ArduinoCloudClient:
                 raise DoneException()
 
     def poll_mqtt(self, aiot=None, args=None):
-        self.mqtt.check_msg()
+        ts = timestamp()
+        while self.mqtt.readable():
+            self.mqtt.wait_msg()
         if self.thing_id is not None:
-            self.senmlpack.clear()
-            for record in self.records.values():
-                if record.updated:
-                    record.add_to_pack(self.senmlpack, push=True)
-            if len(self.senmlpack._data):
-                logging.debug("Pushing records to Arduino IoT cloud:")
-                if log_level_enabled(logging.DEBUG):
-                    for record in self.senmlpack._data:
-                        logging.debug(f"  ==> record: {record.name} value: {str(record.value)[:48]}...")
-                self.mqtt.publish(self.topic_out, self.senmlpack.to_cbor(), qos=1)
-                self.last_ping = timestamp()
-            elif self.keepalive and (timestamp() - self.last_ping) > self.keepalive:
+            pushed = False
+            if self.dirty_records:
+                self.senmlpack.clear()
+                unacked = []    # Records pushed without waiting for an acknowledgment (qos=0).
+                while self.dirty_records:
+                    # Records in this set could have been updated from the cloud since they
+                    # were queued, in which case their updated flag is cleared.
+                    record = self.dirty_records.pop()
+                    if not record.updated:
+                        continue
+                    if record.qos:
+                        record.add_to_pack(self.senmlpack, push=True)
+                    else:
+                        unacked.append(record)
+                pushed = self.push_pack(qos=1)
+                if unacked:
+                    self.senmlpack.clear()
+                    for record in unacked:
+                        record.add_to_pack(self.senmlpack, push=True)
+                    pushed = self.push_pack(qos=0) or pushed
+            if pushed:
+                self.last_ping = ts
+            elif self.keepalive and (ts - self.last_ping) > self.keepalive:
                 self.mqtt.ping()
-                self.last_ping = timestamp()
-                logging.debug("No records to push, sent a ping request.")
+                self.last_ping = ts
+                if log_level_enabled(logging.DEBUG):
+                    logging.debug("No records to push, sent a ping request.")
+
+    def push_pack(self, qos):
+        # Publishes the records in the SenML pack, returns False if the pack is empty.
+        if not self.senmlpack:
+            return False
+        if log_level_enabled(logging.DEBUG):
+            logging.debug(f"Pushing records to Arduino IoT cloud (qos={qos}):")
+            for record in self.senmlpack:
+                logging.debug(f"  ==> record: {record.name} value: {str(record.value)[:48]}...")
+        self.mqtt.publish(self.topic_out, self.encode_pack(), qos=qos)
+        return True
+
+    async def mqtt_watcher(self, sock):
+        # MicroPython's event loop can't call back on socket events, so this task
+        # wakes up the MQTT task when the socket becomes readable instead.
+        while self.mqtt.sock is sock and "mqtt_task" in self.tasks:
+            await _wait_readable(sock)
+            self.socket_readable()
+            await asyncio.sleep(0)  # Let the MQTT task read the data first.
+        # The connection was closed or replaced, so the task is removed from the tasks.
+        raise DoneException()
+
+    async def mqtt_task(self, interval=1.0):
+        # Pushes updated records as soon as they change, and processes incoming messages
+        # as soon as they're received, by waking up when the socket becomes readable.
+        # Otherwise only wakes up when the next keepalive ping is due. If the event loop
+        # can't wait on the socket, incoming messages are checked every interval.
+        sock = self.mqtt.sock
+        loop = None
+        watched = True
+        if hasattr(asyncio, "core"):  # MicroPython
+            if _can_wait_readable():
+                self.create_task("mqtt_watcher", self.mqtt_watcher, sock)
+            else:
+                watched = False
+        else:
+            try:
+                asyncio.get_event_loop().add_reader(sock, self.socket_readable)
+                loop = asyncio.get_event_loop()
+            except NotImplementedError:
+                watched = False
+        if not watched:
+            logging.debug("Event loop can't wait on sockets, polling for incoming messages.")
+        # Bind the objects used on every iteration to locals, to skip the attribute lookups.
+        poll_mqtt = self.poll_mqtt
+        mqtt = self.mqtt
+        dirty = self.dirty
+        dirty_records = self.dirty_records
+        batch_full = self.batch_full
+        wait_for = asyncio.wait_for
+        timeout_error = asyncio.TimeoutError
+        try:
+            while True:
+                poll_mqtt()
+                timeout = interval
+                if watched:
+                    # Note the timeout is at least interval, since pings are only sent after
+                    # discovery, so a ping can be overdue without being sent.
+                    timeout = None
+                    if self.keepalive:
+                        timeout = max(self.last_ping + self.keepalive + 1 - timestamp(), interval)
+                try:
+                    await wait_for(dirty.wait(), timeout)
+                except timeout_error:
+                    pass
+                dirty.clear()
+                # Process incoming messages before waiting for a batch. Records written by
+                # the cloud are dropped from the queue, so only local updates start a batch.
+                while mqtt.readable():
+                    mqtt.wait_msg()
+                # Give other records a chance to change before pushing, so records that are
+                # updated at about the same time get pushed in one message. The wait ends
+                # early if max_batch records are queued, or if a message is received. Note
+                # records can't be pushed before discovery, so there's nothing to wait for.
+                if 0 < len(dirty_records) < self.max_batch and self.max_batch_age and self.thing_id is not None:
+                    batch_full.clear()
+                    try:
+                        await wait_for(batch_full.wait(), self.max_batch_age)
+                    except timeout_error:
+                        pass
+        finally:
+            if loop is not None:
+                loop.remove_reader(sock)
 
     async def run(self, interval, backoff):
-        # Creates tasks from coros here manually before calling
-        # gather, so we can keep track of tasks in self.tasks dict.
+        self.dirty = asyncio.Event()
+        self.batch_full = asyncio.Event()
+        # Done tasks are queued by a done callback, so they can be handled as soon as they're done.
+        # Note support for done callbacks is checked on this coroutine's own task.
+        task = asyncio.current_task() if hasattr(asyncio, "current_task") else None
+        if hasattr(asyncio, "Queue") and hasattr(task, "add_done_callback"):
+            self.done_tasks = asyncio.Queue()
+
+        # Creates tasks from coros here manually before waiting on
+        # them, so we can keep track of tasks in self.tasks dict.
         for name, coro in self.tasks.items():
             self.create_task(name, coro)
 
@@ -402,6 +717,20 @@ class ArduinoCloudClient:
         self.register("connection_task", on_run=self.poll_connect, interval=interval, backoff=backoff)
 
         while True:
+            if self.done_tasks is not None:
+                name, task = await self.done_tasks.get()
+                # Note the exception is retrieved even for skipped tasks, otherwise it gets
+                # logged as never retrieved when the task is destroyed.
+                try:
+                    task_except = task.exception()
+                except (CancelledError, InvalidStateError):
+                    task_except = None
+                if self.tasks.get(name) is task:    # Skip tasks that were replaced since.
+                    self.task_done(name, task_except, interval, backoff)
+                continue
+
+            # MicroPython's asyncio doesn't support done callbacks, so fallback to gather(), which
+            # raises the first exception and has to be called again for the remaining tasks.
             task_except = None
             try:
                 await asyncio.gather(*self.tasks.values(), return_exceptions=False)
@@ -416,23 +745,26 @@ class ArduinoCloudClient:
                 task = self.tasks[name]
                 try:
                     if task.done():
-                        self.tasks.pop(name)
-                        self.records.pop(name, None)
-                        if isinstance(task_except, DoneException) and log_level_enabled(logging.INFO):
-                            logging.info(f"task: {name} complete.")
-                        elif task_except is not None and log_level_enabled(logging.ERROR):
-                            logging.error(f"task: {name} raised exception: {str(task_except)}.")
-                        if name == "mqtt_task":
-                            self.register(
-                                "connection_task",
-                                on_run=self.poll_connect,
-                                interval=interval,
-                                backoff=backoff
-                            )
-                        break   # Break after the first task is removed.
+                        self.task_done(name, task_except, interval, backoff)
+                        break   # Break after the task that raised the exception is removed.
                 except (CancelledError, InvalidStateError):
                     pass
 
+            # Yield to the event loop before gathering the tasks again, to avoid
+            # spinning in this loop if tasks keep failing immediately.
+            await asyncio.sleep(0)
+
+    def task_done(self, name, task_except, interval, backoff):
+        self.tasks.pop(name)
+        self.unregister(name)
+        if isinstance(task_except, DoneException):
+            if log_level_enabled(logging.INFO):
+                logging.info(f"task: {name} complete.")
+        elif task_except is not None and log_level_enabled(logging.ERROR):
+            logging.error(f"task: {name} raised exception: {str(task_except)}.")
+        if name == "mqtt_task":
+            self.register("connection_task", on_run=self.poll_connect, interval=interval, backoff=backoff)
+
     def start(self, interval=1.0, backoff=1.2):
         if self.async_mode:
             asyncio.run(self.run(interval, backoff))
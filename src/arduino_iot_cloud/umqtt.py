@@ -55,7 +55,9 @@ class MQTTClient:
         self.keepalive = keepalive
         self.cb = callback
         self.sock = None
+        self.ssl_session = None     # TLS session of the last connection, if it can be resumed.
         self.pid = 0
+        self.topics = {}  # Encoded topic names (with length prefix) indexed by topic.
         self.lw_topic = None
         self.lw_msg = None
         self.lw_qos = 0
@@ -88,6 +90,10 @@ class MQTTClient:
 
     def connect(self, clean_session=True, timeout=5.0):
         addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+        # The session is dropped until this connection succeeds, so it's not resumed again
+        # if connecting or authenticating fails.
+        session = self.ssl_session
+        self.ssl_session = None
 
         if self.sock is not None:
             self.sock.close()
@@ -95,11 +101,16 @@ class MQTTClient:
 
         self.sock = socket.socket()
         self.sock.settimeout(timeout)
+        try:
+            # Disable Nagle's algorithm, so small packets are sent without delay.
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass  # Not supported by this port.
         if sys.implementation.name == "micropython":
             self.sock.connect(addr)
-            self.sock = ssl.wrap_socket(self.sock, self.ssl_params)
+            self.sock = ssl.wrap_socket(self.sock, self.ssl_params, session)
         else:
-            self.sock = ssl.wrap_socket(self.sock, self.ssl_params)
+            self.sock = ssl.wrap_socket(self.sock, self.ssl_params, session)
             self.sock.connect(addr)
 
         premsg = bytearray(b"\x10\0\0\0\0\0")
@@ -139,6 +150,9 @@ class MQTTClient:
         assert resp[0] == 0x20 and resp[1] == 0x02
         if resp[3] != 0:
             raise MQTTException(resp[3])
+        # Note with TLS 1.3 the session ticket is received after the handshake, so the session
+        # is only available once some data has been read, like the CONNACK above.
+        self.ssl_session = getattr(self.sock, "session", None)
         return resp[2] & 1
 
     def disconnect(self):
@@ -162,14 +176,18 @@ class MQTTClient:
             i += 1
         pkt[i] = sz
         # print(hex(len(pkt)), hexlify(pkt, ":"))
-        self.sock.write(pkt[0:i + 1])
-        self._send_str(topic)
+        # Build the whole packet in a single buffer, so it's sent with one write.
+        buf = pkt[0:i + 1]
+        # The same few topics are used for every publish, so they're only encoded once.
+        if (topic_name := self.topics.get(topic)) is None:
+            topic_name = self.topics[topic] = struct.pack("!H", len(topic)) + topic
+        buf += topic_name
         if qos > 0:
             self.pid += 1
             pid = self.pid
-            struct.pack_into("!H", pkt, 0, pid)
-            self.sock.write(pkt[0:2])
-        self.sock.write(msg)
+            buf += struct.pack("!H", pid)
+        buf += msg
+        self.sock.write(buf)
         if qos == 1:
             while 1:
                 op = self.wait_msg()
@@ -210,8 +228,10 @@ class MQTTClient:
     # messages processed internally.
     def wait_msg(self):
         res = self.sock.read(1)
-        if res is None or res == b"":
+        if res is None:
             return None
+        if res == b"":
+            raise OSError(-1, "Connection closed")
         if res == b"\xd0":  # PINGRESP
             sz = self.sock.read(1)[0]
             assert sz == 0
@@ -240,7 +260,15 @@ class MQTTClient:
     # Checks whether a pending message from server is available.
     # If not, returns immediately with None. Otherwise, does
     # the same processing as wait_msg.
-    def check_msg(self):
-        r, w, e = select.select([self.sock], [], [], 0.05)
-        if len(r):
+    def check_msg(self, timeout=0.05):
+        if self.readable(timeout):
             return self.wait_msg()
+
+    # Returns True if data is available to read, waiting at most timeout seconds.
+    # Note with TLS, decrypted data can still be pending in the SSL object after
+    # everything has been read from the socket itself.
+    def readable(self, timeout=0):
+        if hasattr(self.sock, "pending") and self.sock.pending():
+            return True
+        r, w, e = select.select([self.sock], [], [], timeout)
+        return len(r) > 0
@@ -0,0 +1,129 @@
+# This file is part of the Arduino IoT Cloud Python client.
+# Copyright (c) 2022 Arduino SA
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+# Minimal SenML CBOR encoder for the records pushed to the cloud.
+# The records pushed by the client only have a name and a value, so instead of building
+# a dict for each record and encoding it with the generic CBOR encoder, the maps are
+# written directly using SenML's integer labels (RFC 8428 section 6).
+
+import struct
+
+# SenML CBOR labels.
+SENML_BN = -2
+SENML_N = 0
+SENML_V = 2
+SENML_VS = 3
+SENML_VB = 4
+SENML_VD = 8
+
+# Maps SenML field names to CBOR labels, for decoding records with SenmlRecord._from_raw.
+NAMING_MAP = {"n": SENML_N, "v": SENML_V, "vs": SENML_VS, "vb": SENML_VB, "vd": SENML_VD}
+
+# CBOR major types.
+_CBOR_UINT = 0x00
+_CBOR_NINT = 0x20
+_CBOR_BYTES = 0x40
+_CBOR_TEXT = 0x60
+_CBOR_ARRAY = 0x80
+_CBOR_MAP = 0xA0
+_CBOR_TAG = 0xC0
+
+# CBOR tags for positive and negative bignums.
+_CBOR_TAG_BIGNUM = 2
+_CBOR_TAG_NBIGNUM = 3
+
+
+def _encode_head(buf, major, n):
+    if n < 24:
+        buf.append(major | n)
+    elif n < 0x100:
+        buf.append(major | 24)
+        buf.append(n)
+    elif n < 0x10000:
+        buf.append(major | 25)
+        buf.extend(struct.pack(">H", n))
+    elif n < 0x100000000:
+        buf.append(major | 26)
+        buf.extend(struct.pack(">I", n))
+    else:
+        buf.append(major | 27)
+        buf.extend(struct.pack(">Q", n))
+
+
+def _encode_int(buf, value):
+    if value < 0:
+        major, tag, value = _CBOR_NINT, _CBOR_TAG_NBIGNUM, -1 - value
+    else:
+        major, tag = _CBOR_UINT, _CBOR_TAG_BIGNUM
+    if value < 0x10000000000000000:
+        _encode_head(buf, major, value)
+    else:
+        # Ints that don't fit in 64 bits are encoded as bignums, the same as cbor2 does.
+        # Note MicroPython's int doesn't have bit_length(), so the length is taken from hex.
+        value = value.to_bytes((len("%x" % value) + 1) // 2, "big")
+        _encode_head(buf, _CBOR_TAG, tag)
+        _encode_head(buf, _CBOR_BYTES, len(value))
+        buf.extend(value)
+
+
+def _encode_text(buf, value):
+    value = value.encode("utf-8")
+    _encode_head(buf, _CBOR_TEXT, len(value))
+    buf.extend(value)
+
+
+# Encoded map headers and names of the records, indexed by name. Record names don't change,
+# so they're only encoded the first time a record is pushed.
+_prefixes = {}
+
+
+def _encode_prefix(name):
+    buf = bytearray()
+    _encode_head(buf, _CBOR_MAP, 2 if name else 1)
+    if name:
+        _encode_int(buf, SENML_N)
+        _encode_text(buf, name)
+    prefix = _prefixes[name] = bytes(buf)
+    return prefix
+
+
+def encode_record(buf, name, value):
+    buf.extend(_prefixes.get(name) or _encode_prefix(name))
+    # Note bool must be checked before int, since it's a subclass of int.
+    if isinstance(value, bool):
+        _encode_int(buf, SENML_VB)
+        buf.append(0xF5 if value else 0xF4)
+    elif isinstance(value, int):
+        _encode_int(buf, SENML_V)
+        _encode_int(buf, value)
+    elif isinstance(value, float):
+        _encode_int(buf, SENML_V)
+        # NaN and infinities are encoded as half floats, the same as cbor2 does. Note
+        # value - value is 0 for finite values, and NaN for NaN and infinities.
+        if value - value == 0:
+            buf.append(0xFB)
+            buf.extend(struct.pack(">d", value))
+        elif value != value:
+            buf.extend(b"\xf9\x7e\x00")
+        else:
+            buf.extend(b"\xf9\x7c\x00" if value > 0 else b"\xf9\xfc\x00")
+    elif isinstance(value, str):
+        _encode_int(buf, SENML_VS)
+        _encode_text(buf, value)
+    elif isinstance(value, (bytes, bytearray)):
+        _encode_int(buf, SENML_VD)
+        _encode_head(buf, _CBOR_BYTES, len(value))
+        buf.extend(value)
+    else:
+        raise TypeError(f"{name} has an invalid SenML value type: {type(value)}")
+
+
+def encode_pack(records, buf):
+    # Appends a SenML pack with the given records to buf, and returns buf.
+    _encode_head(buf, _CBOR_ARRAY, len(records))
+    for record in records:
+        encode_record(buf, record.name, record._value)
+    return buf
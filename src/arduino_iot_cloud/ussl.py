@@ -24,8 +24,12 @@ _EC_REF_KEY = binascii.unhexlify(
     b"b6a5a6b5b61000"
 )
 
+# SSL contexts indexed by SSL params. The contexts are reused when reconnecting, so keys
+# and certificates are only loaded once.
+_contexts = {}
 
-def wrap_socket(sock, ssl_params={}):
+
+def wrap_socket(sock, ssl_params={}, session=None):
     keyfile = ssl_params.get("keyfile", None)
     certfile = ssl_params.get("certfile", None)
     cafile = ssl_params.get("cafile", None)
@@ -35,6 +39,12 @@ def wrap_socket(sock, ssl_params={}):
     hostname = ssl_params.get("server_hostname", None)
     micropython = sys.implementation.name == "micropython"
 
+    try:
+        ctx_key = tuple(sorted(ssl_params.items()))
+        ctx = _contexts.get(ctx_key)
+    except TypeError:   # Unhashable param, the context can't be cached.
+        ctx_key = ctx = None
+
     if keyfile is not None and "token" in keyfile and micropython:
         # Create a reference EC key for NXP EdgeLock device.
         objid = int(keyfile.split("=")[1], 16).to_bytes(4, "big")
@@ -46,18 +56,25 @@ def wrap_socket(sock, ssl_params={}):
 
     if keyfile is None or "token" not in keyfile:
         # Use MicroPython/CPython SSL to wrap socket.
-        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-        if hasattr(ctx, "set_default_verify_paths"):
-            ctx.set_default_verify_paths()
-        if hasattr(ctx, "check_hostname") and verify != ssl.CERT_REQUIRED:
-            ctx.check_hostname = False
-        ctx.verify_mode = verify
-        if keyfile is not None and certfile is not None:
-            ctx.load_cert_chain(certfile, keyfile)
-        if ciphers is not None:
-            ctx.set_ciphers(ciphers)
-        if cafile is not None or cadata is not None:
-            ctx.load_verify_locations(cafile=cafile, cadata=cadata)
+        if ctx is None:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            if hasattr(ctx, "set_default_verify_paths"):
+                ctx.set_default_verify_paths()
+            if hasattr(ctx, "check_hostname") and verify != ssl.CERT_REQUIRED:
+                ctx.check_hostname = False
+            ctx.verify_mode = verify
+            if keyfile is not None and certfile is not None:
+                ctx.load_cert_chain(certfile, keyfile)
+            if ciphers is not None:
+                ctx.set_ciphers(ciphers)
+            if cafile is not None or cadata is not None:
+                ctx.load_verify_locations(cafile=cafile, cadata=cadata)
+            if ctx_key is not None:
+                _contexts[ctx_key] = ctx
+        if session is not None and ctx_key is not None:
+            # Resume the TLS session of the previous connection (CPython only), which skips the
+            # full handshake. Sessions can only be resumed with the context that created them.
+            return ctx.wrap_socket(sock, server_hostname=hostname, session=session)
         return ctx.wrap_socket(sock, server_hostname=hostname)
     else:
         # Use M2Crypto to load key and cert from HSM.
@@ -80,24 +97,27 @@ def wrap_socket(sock, ssl_params={}):
             pkcs11.init()
 
         # Create and configure SSL context
-        ctx = SSL.Context("tls")
-        ctx.set_default_verify_paths()
-        ctx.set_allow_unknown_ca(False)
-        if verify == ssl.CERT_NONE:
-            ctx.set_verify(SSL.verify_none, depth=9)
-        else:
-            ctx.set_verify(SSL.verify_peer | SSL.verify_fail_if_no_peer_cert, depth=9)
-        if cafile is not None:
-            if ctx.load_verify_locations(cafile) != 1:
-                raise Exception("Failed to load CA certs")
-        if ciphers is not None:
-            ctx.set_cipher_list(ciphers)
+        if ctx is None:
+            ctx = SSL.Context("tls")
+            ctx.set_default_verify_paths()
+            ctx.set_allow_unknown_ca(False)
+            if verify == ssl.CERT_NONE:
+                ctx.set_verify(SSL.verify_none, depth=9)
+            else:
+                ctx.set_verify(SSL.verify_peer | SSL.verify_fail_if_no_peer_cert, depth=9)
+            if cafile is not None:
+                if ctx.load_verify_locations(cafile) != 1:
+                    raise Exception("Failed to load CA certs")
+            if ciphers is not None:
+                ctx.set_cipher_list(ciphers)
 
-        key = pkcs11.load_private_key(keyfile)
-        m2.ssl_ctx_use_pkey_privkey(ctx.ctx, key.pkey)
+            key = pkcs11.load_private_key(keyfile)
+            m2.ssl_ctx_use_pkey_privkey(ctx.ctx, key.pkey)
 
-        cert = pkcs11.load_certificate(certfile)
-        m2.ssl_ctx_use_x509(ctx.ctx, cert.x509)
+            cert = pkcs11.load_certificate(certfile)
+            m2.ssl_ctx_use_x509(ctx.ctx, cert.x509)
+            if ctx_key is not None:
+                _contexts[ctx_key] = ctx
 
         sslobj = SSL.Connection(ctx, sock=sock)
         if verify == ssl.CERT_NONE:
@@ -0,0 +1,47 @@
+# This file is part of the Python Arduino IoT Cloud.
+# Any copyright is dedicated to the Public Domain.
+# https://creativecommons.org/publicdomain/zero/1.0/
+#
+# Checks that the SenML encoder produces the same CBOR as senml's SenmlPack.to_cbor().
+import pytest
+from senml import SenmlPack
+from senml import SenmlRecord
+from arduino_iot_cloud.usenml import encode_pack
+
+VALUES = [
+    True, False,
+    0, 1, 23, 24, 255, 256, 65535, 65536, 2**32 - 1, 2**32, 2**64 - 1, 2**64, 2**100,
+    -1, -24, -25, -256, -257, -65537, -2**32 - 1, -2**64, -2**64 - 1, -2**100,
+    0.0, -0.0, 1.5, -1.5, 1e300, 3.141592653589793, float("nan"), float("inf"), float("-inf"),
+    "", "a", "x" * 23, "x" * 24, "x" * 300, "héllo",
+    bytearray(), bytearray(b"\x00\x01\x02"), bytearray(300),
+]
+
+
+def to_cbor(records):
+    pack = SenmlPack("")
+    for name, value in records:
+        pack.add(SenmlRecord(name, value=value))
+    return bytes(pack.to_cbor()), bytes(encode_pack(pack._data, bytearray()))
+
+
+@pytest.mark.parametrize("value", VALUES, ids=repr)
+def test_encode_value(value):
+    expected, encoded = to_cbor([("r", value)])
+    assert encoded == expected
+
+
+@pytest.mark.parametrize("name", ["a", "x" * 24, "thing:location:lat", "héllo"])
+def test_encode_name(name):
+    expected, encoded = to_cbor([(name, 1)])
+    assert encoded == expected
+
+
+def test_encode_pack():
+    expected, encoded = to_cbor([(f"r{i}", value) for i, value in enumerate(VALUES * 2)])
+    assert encoded == expected
+
+
+def test_encode_invalid_type():
+    with pytest.raises(TypeError):
+        encode_pack([SenmlRecord("r", value=None)], bytearray())